@@ -10,7 +10,7 @@ porg_deps.py - Resolvedor avançado de dependências para Porg
 """
 
 from __future__ import annotations
-import os, sys, json, time, argparse, subprocess, collections, traceback
+import os, sys, json, time, argparse, collections, traceback, atexit, re, bisect, array, functools, tempfile
 from typing import Dict, List, Set, Tuple, Any
 
 # ---------------------------
@@ -38,9 +38,12 @@ PORTS_DIR = os.environ.get("PORTS_DIR", CONFIG.get("PORTS_DIR", "/usr/ports"))
 INSTALLED_DB = os.environ.get("INSTALLED_DB", CONFIG.get("INSTALLED_DB", os.path.join(CONFIG.get("DB_DIR", "/var/lib/porg/db"), "installed.json")))
 CACHE_DIR = os.environ.get("CACHE_DIR", CONFIG.get("CACHE_DIR", "/var/cache/porg"))
 DEPS_CACHE = os.path.join(CACHE_DIR, "deps_cache.json")
-LOGGER_SCRIPT = os.environ.get("LOGGER_SCRIPT", CONFIG.get("LOGGER_MODULE", "/usr/lib/porg/porg_logger.sh"))
-
-os.makedirs(CACHE_DIR, exist_ok=True)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", CONFIG.get("LOG_LEVEL", "INFO")).upper()
+LOG_COLOR = os.environ.get("LOG_COLOR", CONFIG.get("LOG_COLOR", "true")).lower() == "true"
+# checked at DEBUG call sites so disabled messages are never formatted
+DEBUG_ENABLED = LOG_LEVEL == "DEBUG"
+# parse metafiles of a graph frontier in a process pool (porg.conf RESOLVE_PARALLEL)
+RESOLVE_PARALLEL = os.environ.get("RESOLVE_PARALLEL", CONFIG.get("RESOLVE_PARALLEL", "true")).lower() == "true"
 
 # ---------------------------
 # Tiers priority mapping
@@ -56,157 +59,473 @@ TIER_ORDER = {
 }
 
 # ---------------------------
-# YAML loader: prefer PyYAML if available, fallback to simple parser
+# YAML loader: prefer PyYAML if available, fallback to simple parser.
+# Imported on first use: a warm run answers from deps_cache.json and never
+# parses YAML, and importing yaml costs more than a small resolve itself.
 # ---------------------------
-try:
-    import yaml
-    YAML_AVAILABLE = True
-except Exception:
-    YAML_AVAILABLE = False
+_YAML = None  # (yaml module, loader class) once imported, False without PyYAML
+
+def _yaml_backend():
+    global _YAML
+    if _YAML is None:
+        try:
+            import yaml
+            # libyaml-backed loader is ~10x faster; fall back to the pure-Python one
+            try:
+                from yaml import CSafeLoader as loader
+            except ImportError:
+                from yaml import SafeLoader as loader
+            _YAML = (yaml, loader)
+        except Exception:
+            _YAML = False
+    return _YAML
+
+def yaml_loader_name() -> str:
+    backend = _yaml_backend()
+    return backend[1].__name__ if backend else "builtin"
 
 def load_yaml_file(path: str) -> Dict[str, Any]:
-    if not os.path.isfile(path):
-        return {}
-    if YAML_AVAILABLE:
+    # no separate isfile() stat: a missing/unreadable path just fails open()
+    backend = _yaml_backend()
+    if backend:
+        yaml, loader = backend
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                return yaml.safe_load(f) or {}
+            # bytes input lets libyaml detect the encoding itself (no Python-level decode)
+            with open(path, "rb") as f:
+                return yaml.load(f, Loader=loader) or {}
+        except OSError:
+            return {}
         except Exception:
             # fallback to basic
             pass
-    # basic fallback parser (extracts simple key: value and lists)
-    data = {}
-    current_list_key = None
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.rstrip("\n")
-            s = line.strip()
-            if not s or s.startswith("#"):
-                continue
-            if ":" in s and not s.startswith("-"):
-                k, v = s.split(":", 1)
-                k = k.strip()
-                v = v.strip()
-                if v == "":
-                    data[k] = {}
-                    current_list_key = k
-                else:
-                    # strip quotes
-                    if v.startswith(("'", '"')) and v.endswith(("'", '"')):
-                        v = v[1:-1]
-                    data[k] = v
-                    current_list_key = None
-            elif s.startswith("-") and current_list_key:
-                item = s[1:].strip()
-                if isinstance(data.get(current_list_key), list):
-                    data[current_list_key].append(item)
-                else:
-                    data[current_list_key] = [item]
-            else:
-                # no-op
-                current_list_key = None
+    # fallback: parser for the metafile subset parse_metafile() reads
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    except OSError:
+        return {}
+    return _parse_meta_subset(text)
+
+# top-level keys parse_metafile() looks at; other sections (source, build, ...) are skipped unparsed
+_META_KEYS = frozenset({"name", "pkg", "version", "ver", "release", "dependencies", "depends", "deps",
+                        "requires", "group", "components", "tier", "priority", "metadata"})
+
+def _yaml_scalar(v: str) -> Any:
+    """Plain/quoted scalars, 'true'/'false' and one-line flow lists ('[a, b]'). v is stripped."""
+    q = v[:1]
+    if q == '"' or q == "'":
+        end = v.find(q, 1)
+        return v[1:end] if end > 0 else v[1:]
+    i = v.find(" #")
+    if i >= 0:
+        v = v[:i].rstrip()
+    if v[:1] == "[" and v[-1:] == "]":
+        return [_yaml_scalar(x.strip()) for x in v[1:-1].split(",") if x.strip()]
+    if v == "true" or v == "false":
+        return v == "true"
+    return v
+
+# a top-level line: anything not indented, not a comment and not a list item.
+# Anchored on a literal '\n' (not '^' + re.M) so the scan can skip ahead to newlines.
+_YAML_TOP_LINE = re.compile(r'\n([^ \t\n#-][^\n]*)')
+
+def _parse_meta_subset(text: str) -> Dict[str, Any]:
+    """
+    A top-level key holds a scalar, a list, or a mapping of scalars/lists (one
+    nesting level); deeper nesting and block scalars ('|', '>') are skipped.
+    Top-level lines are located by one regex scan, so the lines of sections
+    parse_metafile() does not read (source, build, ...) are never visited.
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n" + text
+    data: Dict[str, Any] = {}
+    tops = list(_YAML_TOP_LINE.finditer(text))
+    for i, m in enumerate(tops):
+        k, sep, v = m.group(1).partition(":")
+        k = k.strip()
+        if not sep or k not in _META_KEYS:
+            continue
+        v = v.strip()
+        if v and v[0] != "#":
+            if v[0] != "|" and v[0] != ">":
+                data[k] = _yaml_scalar(v)
+            continue
+        data[k] = {}
+        end = tops[i + 1].start() if i + 1 < len(tops) else len(text)
+        _parse_meta_section(data, k, text[m.end():end])
     return data
 
+def _parse_meta_section(data: Dict[str, Any], key: str, body: str):
+    """Fills data[key] (initially {}) from the indented/list lines below it."""
+    sub = None        # current 2nd-level key (mapping section)
+    sub_indent = -1   # indent of the 2nd-level keys
+    skip_indent = -1  # inside a nested block scalar/mapping: skip lines deeper than this
+    for line in body.split("\n"):
+        # left-strip only: values are stripped after partition/slicing anyway
+        s = line.lstrip()
+        if not s or s[0] == "#":
+            continue
+        indent = len(line) - len(s)
+        if skip_indent >= 0:
+            if indent > skip_indent:
+                continue
+            skip_indent = -1
+        cur = data[key]
+        if s[0] == "-":
+            item = _yaml_scalar(s[1:].strip())
+            if sub is not None and indent >= sub_indent:
+                if isinstance(cur[sub], list):
+                    cur[sub].append(item)
+            elif isinstance(cur, list):
+                cur.append(item)
+            elif cur == {}:
+                data[key] = [item]
+            continue
+        if not isinstance(cur, dict):
+            continue
+        if sub_indent < 0:
+            sub_indent = indent
+        elif indent > sub_indent:
+            # deeper mapping (eg. metadata.x.y) is not needed
+            continue
+        sk, sep, sv = s.partition(":")
+        if not sep:
+            continue
+        sk = sk.strip()
+        sv = sv.strip()
+        sub = sk
+        if not sv or sv[0] == "#":
+            cur[sk] = []
+        elif sv[0] == "|" or sv[0] == ">":
+            cur[sk] = ""
+            skip_indent = indent
+        else:
+            cur[sk] = _yaml_scalar(sv)
+
 # ---------------------------
-# Logging helper: if porg_logger.sh exists call it, else print
+# Logging helper: in-process port of porg_logger.sh (format, streams, palette);
+# no bash subprocess per message
 # ---------------------------
+_LOG_COLORS = {"INFO": "\033[0;32m", "WARN": "\033[0;33m", "ERROR": "\033[0;31m", "DEBUG": "\033[0;36m", "STAGE": "\033[0;35m"}
+_LOG_RESET = "\033[0m"
+# session log of the calling porg shell (porg_logger.sh), if it exported one
+SESSION_LOG_FILE = os.environ.get("SESSION_LOG_FILE", "")
+_SESSION_LOG = None  # opened once on first message, False when unusable
+
+def _session_log_append(line: str):
+    global _SESSION_LOG
+    if _SESSION_LOG is None:
+        try:
+            _SESSION_LOG = open(SESSION_LOG_FILE, "a", encoding="utf-8")
+        except OSError:
+            _SESSION_LOG = False
+    if _SESSION_LOG:
+        _SESSION_LOG.write(line + "\n")
+        _SESSION_LOG.flush()
+
 def shell_log(level: str, msg: str):
     """
-    Attempts to call porg_logger.sh functions if available, else prints.
+    Prints '<ts> [LEVEL] msg' like porg_logger.sh, DEBUG only with
+    LOG_LEVEL=DEBUG, colored when LOG_COLOR=true on a tty. Every level goes to
+    stderr: stdout carries the JSON the shell callers pipe into jq.
+    Also appended (uncolored) to SESSION_LOG_FILE when exported.
     level in: INFO, WARN, ERROR, DEBUG, STAGE
     """
-    if os.path.isfile(LOGGER_SCRIPT):
-        # call logger in a subshell to avoid altering env
+    if level == "DEBUG" and not DEBUG_ENABLED:
+        return
+    stream = sys.stderr
+    line = f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())} [{level}] {msg}"
+    if SESSION_LOG_FILE:
+        _session_log_append(line)
+    color = _LOG_COLORS.get(level) if LOG_COLOR and stream.isatty() else None
+    if color:
+        line = f"{color}{line}{_LOG_RESET}"
+    print(line, file=stream)
+
+# ---------------------------
+# JSON file I/O: orjson when available, atomic writes
+# ---------------------------
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
+def read_json_file(path: str) -> Any:
+    """Parses a JSON file; raises OSError/ValueError like json.load()."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+def write_json_file(path: str, data: Any, indent: bool = False, sort_keys: bool = False):
+    """
+    Serializes data to a unique <path>.tmp.* file and os.replace()s it over path, so an
+    interrupted write never leaves a truncated file behind. Creates the parent
+    directory on demand, so nothing is created at import time; commands that
+    write caches (including 'check' and 'info') create CACHE_DIR here.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if ORJSON_AVAILABLE:
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        raw = orjson.dumps(data, option=opt, default=str)
+    else:
+        raw = json.dumps(data, indent=2 if indent else None, ensure_ascii=False, sort_keys=sort_keys, default=str).encode("utf-8")
+    # unique temp file per writer (like porg_db.sh's mktemp "${dest}.tmp.XXXX")
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".tmp.")
+    try:
+        # mkstemp creates 0600; keep the mode of the file being replaced
         try:
-            subprocess.run(["bash", "-lc",
-                            f"source '{LOGGER_SCRIPT}' >/dev/null 2>&1 || true; "
-                            f"if declare -f log_{level.lower()} >/dev/null 2>&1; then log_{level.lower()} '{msg.replace(\"'\",\"'\\\\''\")}' ; else echo '[{level}] {msg}'; fi"],
-                           check=False)
-            return
-        except Exception:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o644
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
             pass
-    # fallback
-    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    if level == "ERROR":
-        print(f"{ts} [{level}] {msg}", file=sys.stderr)
-    else:
-        print(f"{ts} [{level}] {msg}")
+        raise
 
 # ---------------------------
 # Installed DB helpers
 # ---------------------------
-def read_installed_db() -> Dict[str, Dict[str, Any]]:
+def _file_stamp(path: str):
+    """(mtime_ns, size) of path, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# last parse of INSTALLED_DB, reused while its mtime/size are unchanged
+_DB_CACHE: Dict[str, Any] = {"stamp": None, "data": None}
+
+def read_installed_db_stamped() -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+    """
+    Returns (stamp, parsed INSTALLED_DB), the stamp being the _file_stamp()
+    the data was read under. The dict is shared between callers, do not mutate.
+    """
+    stamp = _file_stamp(INSTALLED_DB)
+    if stamp is None:
+        return None, {}
+    if _DB_CACHE["stamp"] == stamp:
+        return stamp, _DB_CACHE["data"]
     try:
-        if os.path.isfile(INSTALLED_DB):
-            with open(INSTALLED_DB, "r", encoding="utf-8") as f:
-                return json.load(f)
+        data = read_json_file(INSTALLED_DB)
     except Exception:
         shell_log("WARN", f"Failed to read installed DB {INSTALLED_DB}, treating as empty")
-    return {}
+        return stamp, {}
+    _DB_CACHE["stamp"], _DB_CACHE["data"] = stamp, data
+    return stamp, data
 
-def is_installed(pkgname: str, installed_db: Dict[str, Any]) -> bool:
-    for k, v in installed_db.items():
-        if k == pkgname or k.startswith(pkgname + "-") or v.get("name") == pkgname:
-            return True
-    return False
+def read_installed_db() -> Dict[str, Dict[str, Any]]:
+    """Returns the parsed INSTALLED_DB; shared between callers, do not mutate."""
+    return read_installed_db_stamped()[1]
 
-def installed_version(pkgname: str, installed_db: Dict[str, Any]) -> str:
+def build_installed_index(installed_db: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Map every name a DB entry answers to (its key, each dash-prefix of the key
+    and v["name"]) to the entry. The first entry in DB order wins, which is
+    what the old linear scan returned.
+    """
+    index: Dict[str, Dict[str, Any]] = {}
     for k, v in installed_db.items():
-        if k == pkgname or k.startswith(pkgname + "-") or v.get("name") == pkgname:
-            return v.get("version", "")
-    return ""
+        if not isinstance(v, dict):
+            v = {}
+        index.setdefault(k, v)
+        pos = k.find("-")
+        while pos > 0:
+            index.setdefault(k[:pos], v)
+            pos = k.find("-", pos + 1)
+        if v.get("name"):
+            index.setdefault(v["name"], v)
+    return index
+
+def is_installed(pkgname: str, installed_db: Dict[str, Any], index: Dict[str, Any] = None) -> bool:
+    if index is None:
+        index = build_installed_index(installed_db)
+    return pkgname in index
+
+def installed_version(pkgname: str, installed_db: Dict[str, Any], index: Dict[str, Any] = None) -> str:
+    if index is None:
+        index = build_installed_index(installed_db)
+    entry = index.get(pkgname)
+    return entry.get("version", "") if entry is not None else ""
 
 # ---------------------------
-# Metafile discovery
+# Metafile discovery (PORTS_DIR is indexed once per process)
 # ---------------------------
+PORTS_INDEX_CACHE = os.path.join(CACHE_DIR, "ports_index.json")
+_METAFILE_EXT_RE = re.compile(r'\.ya?ml\Z', re.I)
+# subtrees that never hold metafiles (VCS metadata, sources, build trees)
+_SKIP_DIRS = frozenset({".git", ".svn", ".hg", "distfiles", "work", "build", "pkg", "__pycache__"})
+_PORTS_INDEX: Dict[str, str] = {}          # lowercased name -> metafile path
+_PORTS_STEMS: List[Tuple[str, str]] = []   # sorted (stem, path), for plain prefix lookups
+_PORTS_INDEX_READY = False
+
+def _version_key(s: str) -> Tuple:
+    return tuple((1, int(t)) if t.isdigit() else (0, t) for t in re.findall(r"\d+|[a-z]+", s))
+
+def _scan_ports_dir() -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+    """
+    Single os.scandir pass over PORTS_DIR (same tree os.walk would visit, minus _SKIP_DIRS).
+    Returns sorted [(stem_lower, path)] of metafiles and {dir: mtime_ns} for invalidation.
+    """
+    files: List[Tuple[str, str]] = []
+    dirs: Dict[str, int] = {}
+    ext_search = _METAFILE_EXT_RE.search
+    pending = [PORTS_DIR]
+    while pending:
+        d = pending.pop()
+        try:
+            dirs[d] = os.stat(d).st_mtime_ns
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in _SKIP_DIRS:
+                            pending.append(e.path)
+                        continue
+                    # end-anchored search; the match offset gives the stem without rsplit()
+                    name = e.name
+                    m = ext_search(name)
+                    if m:
+                        files.append((name[:m.start()].lower(), e.path))
+        except OSError:
+            continue
+    files.sort()
+    return files, dirs
+
+def _index_metafiles(files: List[Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Maps every name a metafile can answer to: its full stem ('gcc-pass1') and each
+    dash-prefix of it ('gcc'). An exact stem wins, then '<name>-<version>' files
+    (highest version), then other suffixes ('-pass1') in sorted order.
+    """
+    cands: Dict[str, List[Tuple[int, Tuple, str]]] = {}
+    for stem, path in files:
+        cands.setdefault(stem, []).append((0, (), path))
+        parts = stem.split("-")
+        for i in range(1, len(parts)):
+            rest = "-".join(parts[i:])
+            if rest[:1].isdigit():
+                cands.setdefault("-".join(parts[:i]), []).append((1, _version_key(rest), path))
+            else:
+                cands.setdefault("-".join(parts[:i]), []).append((2, (), path))
+    index = {}
+    for key, lst in cands.items():
+        tier = min(c[0] for c in lst)
+        best = [c for c in lst if c[0] == tier]
+        index[key] = max(best, key=lambda c: c[1])[2] if tier == 1 else best[0][2]
+    return index
+
+def _load_ports_index_cache() -> bool:
+    global _PORTS_INDEX, _PORTS_STEMS
+    try:
+        cached = read_json_file(PORTS_INDEX_CACHE)
+        # an index scanned with another prune list may list (or miss) metafiles
+        if cached.get("ports_dir") != PORTS_DIR or cached.get("skip_dirs") != sorted(_SKIP_DIRS):
+            return False
+        # any added/removed/renamed entry bumps the mtime of its directory
+        for d, mtime in cached["dirs"].items():
+            if os.stat(d).st_mtime_ns != mtime:
+                return False
+        _PORTS_INDEX = cached["index"]
+        _PORTS_STEMS = [tuple(x) for x in cached["files"]]
+        return True
+    except Exception:
+        return False
+
+def _build_ports_index():
+    global _PORTS_INDEX, _PORTS_STEMS, _PORTS_INDEX_READY
+    _PORTS_INDEX_READY = True
+    if _load_ports_index_cache():
+        return
+    files, dirs = _scan_ports_dir()
+    _PORTS_STEMS = files
+    _PORTS_INDEX = _index_metafiles(files)
+    if PORTS_DIR not in dirs:
+        # PORTS_DIR missing/unreadable: nothing worth persisting
+        return
+    try:
+        write_json_file(PORTS_INDEX_CACHE, {"ports_dir": PORTS_DIR, "skip_dirs": sorted(_SKIP_DIRS), "dirs": dirs, "files": files, "index": _PORTS_INDEX})
+    except Exception:
+        pass
+
+@functools.lru_cache(maxsize=None)
 def find_metafile(pkg: str) -> str:
     """
     Procura por <pkg>*.yml/yaml dentro de PORTS_DIR e suas subpastas.
-    Retorna o primeiro caminho encontrado ou ''.
-    """
-    if not os.path.isdir(PORTS_DIR):
-        return ""
-    for root, _, files in os.walk(PORTS_DIR):
-        for fn in files:
-            ln = fn.lower()
-            if not (ln.endswith(".yml") or ln.endswith(".yaml")):
-                continue
-            name_noext = ln.rsplit(".", 1)[0]
-            # try to match prefix
-            if name_noext.startswith(pkg.lower()):
-                return os.path.join(root, fn)
+    Retorna o caminho encontrado ou ''. Memoizado (find_metafile.cache_clear()).
+    """
+    if not _PORTS_INDEX_READY:
+        _build_ports_index()
+    key = pkg.lower()
+    hit = _PORTS_INDEX.get(key)
+    if hit is not None:
+        return hit
+    # plain prefix match on the stem (eg: 'gc' -> gcc-13.2.0.yaml)
+    i = bisect.bisect_left(_PORTS_STEMS, (key,))
+    if i < len(_PORTS_STEMS) and _PORTS_STEMS[i][0].startswith(key):
+        return _PORTS_STEMS[i][1]
     return ""
 
 # ---------------------------
 # Parse a package metafile returning canonical dict
 # ---------------------------
+# bump whenever parse_metafile() output changes, so cached results are re-parsed
+META_SCHEMA = 2
+# first char of a version constraint / qualifier: 'glibc>=2.38', 'zlib (optional)', 'a|b', ...
+_DEP_SEP_RE = re.compile(r'[\s<>=!(\[{;,|]')
+
+def _normalize_dep_name(s: str) -> str:
+    """Strips version constraints/qualifiers from a dependency spec (one C-level split)."""
+    return _DEP_SEP_RE.split(s.strip(), 1)[0]
+
+# dependency lists read by parse_metafile(): sections of a 'dependencies:' mapping
+# and top-level alternatives
+_DEP_SECTIONS = ("build", "runtime", "optional")
+_DEP_ALT_KEYS = ("deps", "requires")
+
+def _extend_deps(dst: Dict[str, None], items):
+    """Adds the normalized names of a dependency list to dst (an ordered set); non-strings are ignored."""
+    for d in items:
+        if isinstance(d, str):
+            n = _normalize_dep_name(d)
+            if n:
+                dst[n] = None
+
+@functools.lru_cache(maxsize=None)
 def parse_metafile(path: str) -> Dict[str, Any]:
     data = load_yaml_file(path)
     result = {}
     result["path"] = path
     result["name"] = data.get("name") or data.get("pkg") or os.path.splitext(os.path.basename(path))[0]
     result["version"] = str(data.get("version") or data.get("ver") or data.get("release") or "")
-    # dependencies could be present as dependencies.build/runtime/optional or dependencies: [..]
-    deps = []
+    # dependencies could be present as dependencies.build/runtime/optional or dependencies: [..];
+    # names are normalized and de-duplicated (order preserved) straight into one dict
+    deps: Dict[str, None] = {}
     dd = data.get("dependencies") or data.get("depends") or {}
     if isinstance(dd, dict):
-        for key in ("build", "runtime", "optional"):
+        for key in _DEP_SECTIONS:
             val = dd.get(key)
             if isinstance(val, list):
-                deps.extend(val)
+                _extend_deps(deps, val)
             elif isinstance(val, str):
-                deps.append(val)
+                _extend_deps(deps, (val,))
     elif isinstance(dd, list):
-        deps.extend(dd)
-    # also support top-level 'depends' or 'deps' lists
-    for alt in ("deps", "requires"):
+        _extend_deps(deps, dd)
+    # also support top-level 'deps' or 'requires' lists
+    for alt in _DEP_ALT_KEYS:
         av = data.get(alt)
         if isinstance(av, list):
-            deps.extend(av)
-    # normalize unique
-    result["dependencies"] = list(dict.fromkeys([d for d in deps if d]))
+            _extend_deps(deps, av)
+    result["dependencies"] = list(deps)
     # group components
-    if data.get("group") or data.get("components") or data.get("components"):
+    if data.get("group") or data.get("components"):
         result["is_group"] = True
         comps = data.get("components") or []
         if isinstance(comps, str):
@@ -226,21 +545,157 @@ def parse_metafile(path: str) -> Dict[str, Any]:
 # ---------------------------
 # Cache metafile parsing to avoid repeated IO
 # ---------------------------
-_PARSED_METAFILES: Dict[str, Dict[str, Any]] = {}
+# per-package memo shared by every command in this process
+_PKG_META: Dict[str, Dict[str, Any]] = {}
+# parsed metafiles persisted across runs: {path: {"path", "mtime", "size", "schema", "meta"}}
+_DEPS_CACHE: Dict[str, Dict[str, Any]] = {}
+_DEPS_CACHE_LOADED = False
+_DEPS_CACHE_DIRTY = False
+
+def load_cache() -> Dict[str, Any]:
+    try:
+        if os.path.isfile(DEPS_CACHE):
+            data = read_json_file(DEPS_CACHE)
+            if isinstance(data, dict):
+                return data
+    except Exception:
+        if DEBUG_ENABLED:
+            shell_log("DEBUG", f"Ignoring unreadable deps cache {DEPS_CACHE}")
+    return {}
+
+def save_cache(cache: Dict[str, Any]):
+    try:
+        write_json_file(DEPS_CACHE, cache, indent=True)
+    except Exception:
+        if DEBUG_ENABLED:
+            shell_log("DEBUG", f"Could not write deps cache {DEPS_CACHE}")
+
+def _deps_cache() -> Dict[str, Dict[str, Any]]:
+    global _DEPS_CACHE, _DEPS_CACHE_LOADED
+    if not _DEPS_CACHE_LOADED:
+        # drops entries of the older per-package layout (keyed by name)
+        _DEPS_CACHE = {k: v for k, v in load_cache().items() if isinstance(v, dict) and v.get("path") == k}
+        _DEPS_CACHE_LOADED = True
+        # written once per process, and only if some entry changed
+        atexit.register(_flush_deps_cache)
+    return _DEPS_CACHE
+
+def _prune_deps_cache() -> bool:
+    """
+    Drops entries of metafiles that no longer exist (renamed on upgrade,
+    removed ports). Uses the ports index when this run built it, else stat().
+    Returns True if anything was dropped.
+    """
+    if _PORTS_INDEX_READY:
+        live = {path for _, path in _PORTS_STEMS}
+        stale = [mf for mf in _DEPS_CACHE if mf not in live]
+    elif _DEPS_CACHE_DIRTY:
+        stale = [mf for mf in _DEPS_CACHE if not os.path.isfile(mf)]
+    else:
+        return False
+    for mf in stale:
+        del _DEPS_CACHE[mf]
+    return bool(stale)
+
+def _flush_deps_cache():
+    global _DEPS_CACHE_DIRTY
+    if _prune_deps_cache():
+        _DEPS_CACHE_DIRTY = True
+    if _DEPS_CACHE_DIRTY:
+        save_cache(_DEPS_CACHE)
+        _DEPS_CACHE_DIRTY = False
+
 def get_pkg_meta(pkg: str) -> Dict[str, Any]:
+    pm = _PKG_META.get(pkg)
+    if pm is None:
+        pm = _PKG_META[pkg] = _load_pkg_meta(pkg)
+    return pm
+
+def _cached_metafile(mf: str, stamp) -> Dict[str, Any]:
+    """Parsed metafile from deps_cache.json if still valid, else None."""
+    if stamp is None:
+        return None
+    entry = _deps_cache().get(mf)
+    if entry is not None and (entry.get("mtime"), entry.get("size")) == stamp and entry.get("schema") == META_SCHEMA:
+        return entry["meta"]
+    return None
+
+def _store_metafile(mf: str, stamp, p: Dict[str, Any]):
+    global _DEPS_CACHE_DIRTY
+    if stamp is not None:
+        _deps_cache()[mf] = {"path": mf, "mtime": stamp[0], "size": stamp[1], "schema": META_SCHEMA, "meta": p}
+        _DEPS_CACHE_DIRTY = True
+
+def _load_pkg_meta(pkg: str) -> Dict[str, Any]:
     # search for metafile
     mf = find_metafile(pkg)
     if not mf:
         return {"name": pkg, "version": "", "dependencies": [], "is_group": False, "components": [], "tier": "unknown", "path": ""}
-    if mf in _PARSED_METAFILES:
-        return _PARSED_METAFILES[mf]
+    stamp = _file_stamp(mf)
+    p = _cached_metafile(mf, stamp)
+    if p is not None:
+        return p
     try:
         p = parse_metafile(mf)
-        _PARSED_METAFILES[mf] = p
-        return p
     except Exception:
         shell_log("WARN", f"Failed to parse metafile {mf}")
         return {"name": pkg, "version": "", "dependencies": [], "is_group": False, "components": [], "tier": "unknown", "path": mf}
+    _store_metafile(mf, stamp, p)
+    return p
+
+def _parse_metafile_worker(mf: str):
+    # runs in a pool process; failures are left to the serial path (which logs them)
+    try:
+        return parse_metafile(mf)
+    except Exception:
+        return None
+
+# below this many metafiles to parse, starting/feeding worker processes costs more than it saves
+_PREFETCH_MIN = 16
+_PARSE_POOL = None
+
+def _parse_pool(workers: int):
+    global _PARSE_POOL
+    if _PARSE_POOL is None:
+        # imported here: most runs never start the pool
+        import concurrent.futures
+        # load yaml before forking so each worker inherits it instead of
+        # importing it again on its first metafile
+        _yaml_backend()
+        _PARSE_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        atexit.register(_PARSE_POOL.shutdown)
+    return _PARSE_POOL
+
+def prefetch_pkg_meta(pkgs: List[str]):
+    """
+    Parses the metafiles of pkgs that are neither memoized nor valid in
+    deps_cache.json in a process pool (YAML parsing holds the GIL, so threads
+    do not overlap it). Results land in deps_cache, where
+    get_pkg_meta() picks them up; callers are unchanged.
+    """
+    if not RESOLVE_PARALLEL:
+        return
+    workers = os.cpu_count() or 1
+    todo = [p for p in dict.fromkeys(pkgs) if p not in _PKG_META]
+    if len(todo) < _PREFETCH_MIN or workers < 2:
+        return
+    paths = []
+    stamps = {}
+    for p in todo:
+        mf = find_metafile(p)
+        if not mf or mf in stamps:
+            continue
+        stamp = stamps[mf] = _file_stamp(mf)
+        if _cached_metafile(mf, stamp) is None:
+            paths.append(mf)
+    if len(paths) < _PREFETCH_MIN:
+        return
+    workers = min(workers, len(paths))
+    pool = _parse_pool(workers)
+    chunk = max(1, len(paths) // (workers * 4))
+    for mf, p in zip(paths, pool.map(_parse_metafile_worker, paths, chunksize=chunk)):
+        if p is not None:
+            _store_metafile(mf, stamps[mf], p)
 
 # ---------------------------
 # Expand group metafiles to components
@@ -263,17 +718,38 @@ def expand_group(pkg: str) -> List[str]:
 # ---------------------------
 class DepResolver:
     def __init__(self):
-        self.installed_db = read_installed_db()
+        self.installed_db: Dict[str, Dict[str, Any]] = {}
+        self._installed_index: Dict[str, Dict[str, Any]] = {}  # name -> DB entry
+        self._installed_versions: Dict[str, str] = {}          # name -> installed version
+        self._installed_stamp = None
+        self.reload_installed_db(force=True)
         self.graph: Dict[str, Set[str]] = {}   # node -> set(deps)
         self.meta: Dict[str, Dict[str, Any]] = {}  # node -> metadata
-        self.visiting: Set[str] = set()
-        self.visited: Set[str] = set()
+        # the same graph over interned ids, for the traversal algorithms
+        self._id: Dict[str, int] = {}     # node -> id
+        self._name: List[str] = []        # id -> node
+        self._adj: List[List[int]] = []   # id -> dep ids, in insertion order
         self.cycles: List[List[str]] = []
         self.needs_rebuild_cache: Dict[str, bool] = {}
 
+    def reload_installed_db(self, force: bool = False):
+        """
+        (Re)load INSTALLED_DB and its name index. Without force this is a no-op
+        unless the file changed since the last load (long-running callers).
+        """
+        if not force and _file_stamp(INSTALLED_DB) == self._installed_stamp:
+            return
+        # keep the stamp the data was read under, not the one just checked
+        self._installed_stamp, self.installed_db = read_installed_db_stamped()
+        self._installed_index = build_installed_index(self.installed_db)
+        self._installed_versions = {n: e.get("version", "") for n, e in self._installed_index.items()}
+
     def add_node(self, pkg: str):
-        if pkg in self.graph:
+        if pkg in self._id:
             return
+        self._id[pkg] = len(self._name)
+        self._name.append(pkg)
+        self._adj.append([])
         self.graph[pkg] = set()
         pm = get_pkg_meta(pkg)
         self.meta[pkg] = pm
@@ -281,95 +757,191 @@ class DepResolver:
     def add_edge(self, pkg: str, dep: str):
         self.add_node(pkg)
         self.add_node(dep)
-        self.graph[pkg].add(dep)
+        deps = self.graph[pkg]
+        if dep not in deps:
+            deps.add(dep)
+            self._adj[self._id[pkg]].append(self._id[dep])
 
     def build_graph_for(self, roots: List[str], expand_groups=True):
         """
         roots: list of package names or group names
         expand_groups: if True, expand group metafiles automatically
         """
-        to_process = list(roots)
-        while to_process:
-            cur = to_process.pop(0)
-            # if group expand
-            comps = expand_group(cur) if expand_groups else [cur]
-            for comp in comps:
-                if comp not in self.graph:
-                    self.add_node(comp)
-                # parse meta
-                pm = get_pkg_meta(comp)
-                deps = pm.get("dependencies", []) or []
-                # add dependencies edges
-                for d in deps:
-                    self.add_edge(comp, d)
-                    if d not in self.graph:
-                        to_process.append(d)
-                # if metafile is a group and has components, ensure components become processed
-                if pm.get("is_group"):
-                    for c in pm.get("components", []):
-                        if c not in self.graph:
-                            to_process.append(c)
-
-    def _dfs_cycle(self, node: str, stack: List[str]):
-        if node in self.visiting:
-            # cycle found
-            try:
-                idx = stack.index(node)
-                cyc = stack[idx:] + [node]
-                self.cycles.append(cyc)
-            except ValueError:
-                self.cycles.append(stack + [node])
-            return
-        if node in self.visited:
-            return
-        self.visiting.add(node)
-        stack.append(node)
-        for dep in self.graph.get(node, []):
-            self._dfs_cycle(dep, stack)
-        stack.pop()
-        self.visiting.remove(node)
-        self.visited.add(node)
+        # breadth-first by frontier. Per level: collect the components and the next
+        # frontier from metadata alone, parse the whole next frontier at once
+        # (prefetch_pkg_meta), then insert nodes/edges in the order a FIFO queue would.
+        # Adding a dep node fetches its metadata, so doing it before the prefetch
+        # would parse the next level one file at a time.
+        frontier = list(roots)
+        # every name is queued at most once, however many parents/sections list it
+        queued: Set[str] = set(frontier)
+        prefetch_pkg_meta(frontier)
+        while frontier:
+            level: List[Tuple[str, Dict[str, Any]]] = []
+            next_frontier: List[str] = []
+            for cur in frontier:
+                # if group expand
+                comps = expand_group(cur) if expand_groups else [cur]
+                queued.update(comps)
+                for comp in comps:
+                    pm = get_pkg_meta(comp)
+                    level.append((comp, pm))
+                    # dependencies are already de-duplicated
+                    for d in pm.get("dependencies", []) or []:
+                        if d not in queued:
+                            queued.add(d)
+                            next_frontier.append(d)
+                    # if metafile is a group and has components, ensure components become processed
+                    if pm.get("is_group"):
+                        for c in pm.get("components", []):
+                            if c not in queued:
+                                queued.add(c)
+                                next_frontier.append(c)
+            prefetch_pkg_meta(next_frontier)
+            for comp, pm in level:
+                self.add_node(comp)
+                # add dependencies edges (add_edge() inlined: comp's entries are looked up once)
+                comp_deps = self.graph[comp]
+                comp_adj = self._adj[self._id[comp]]
+                for d in pm.get("dependencies", []) or []:
+                    if d not in comp_deps:
+                        self.add_node(d)
+                        comp_deps.add(d)
+                        comp_adj.append(self._id[d])
+            frontier = next_frontier
 
-    def detect_cycles(self) -> List[List[str]]:
-        self.visiting.clear(); self.visited.clear(); self.cycles.clear()
-        for n in list(self.graph.keys()):
-            if n not in self.visited:
-                self._dfs_cycle(n, [])
-        return self.cycles
+    def _scc_ids(self) -> List[List[int]]:
+        """
+        Iterative Tarjan SCC over node ids, O(V+E): a work stack of
+        (node, deps iterator) replaces recursion. Components come out
+        dependencies-first; within a component the DFS root is the last element.
+        """
+        adj = self._adj
+        n = len(adj)
+        index = array.array("i", [-1]) * n
+        low = array.array("i", [0]) * n
+        on_stack = bytearray(n)
+        comp_stack: List[int] = []
+        sccs: List[List[int]] = []
+        counter = 0
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            comp_stack.append(root)
+            on_stack[root] = 1
+            work = [(root, iter(adj[root]))]
+            while work:
+                v, it = work[-1]
+                w = next(it, -1)
+                if w >= 0:
+                    if index[w] < 0:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        comp_stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, iter(adj[w])))
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = comp_stack.pop()
+                        on_stack[w] = 0
+                        comp.append(w)
+                        if w == v:
+                            break
+                    sccs.append(comp)
+        return sccs
 
-    def topo_sort(self) -> List[str]:
+    def _cycle_path(self, comp: List[int]) -> List[str]:
+        """Shortest cycle through the component's root (BFS inside it), as [root, ..., root]."""
+        adj = self._adj
+        name = self._name
+        start = comp[-1]
+        members = set(comp)
+        parent: Dict[int, int] = {}
+        q = collections.deque([start])
+        while q:
+            n = q.popleft()
+            for d in adj[n]:
+                if d == start:
+                    back = []
+                    while n != start:
+                        back.append(n)
+                        n = parent[n]
+                    return [name[start]] + [name[v] for v in reversed(back)] + [name[start]]
+                if d in members and d not in parent:
+                    parent[d] = n
+                    q.append(d)
+        return [name[v] for v in reversed(comp)] + [name[start]]
+
+    def detect_cycles(self) -> List[List[str]]:
         """
-        Topological sort returning list where dependencies come BEFORE dependents.
-        If cycles exist, return a best-effort order and log cycles.
+        One cycle per strongly connected component with more than one node
+        (or a self-dependency), rendered as a concrete path through its root.
         """
-        indeg = {n: 0 for n in self.graph}
-        for n, deps in self.graph.items():
-            for d in deps:
-                indeg[d] = indeg.get(d, 0) + 1
-        q = collections.deque([n for n,deg in indeg.items() if deg == 0])
+        self.cycles.clear()
+        adj = self._adj
+        for comp in self._scc_ids():
+            if len(comp) > 1 or comp[0] in adj[comp[0]]:
+                self.cycles.append(self._cycle_path(comp))
+        return self.cycles
+
+    def _topo_ids(self) -> List[int]:
+        # Kahn over the reversed edges: a node is ready once all of its deps are
+        # emitted, so indegree = number of deps and the reverse map says whom to release
+        adj = self._adj
+        n = len(adj)
+        indeg = array.array("i", map(len, adj))
+        rdeps: List[List[int]] = [[] for _ in range(n)]
+        for v in range(n):
+            for d in adj[v]:
+                rdeps[d].append(v)
+        q = collections.deque([v for v in range(n) if not indeg[v]])
         order = []
         while q:
-            n = q.popleft()
-            order.append(n)
-            for m in list(self.graph.get(n, [])):
+            v = q.popleft()
+            order.append(v)
+            for m in rdeps[v]:
                 indeg[m] -= 1
                 if indeg[m] == 0:
                     q.append(m)
-        if len(order) != len(self.graph):
+        if len(order) != n:
             # cycle detected - fallback: append remaining nodes
-            remaining = [n for n in self.graph if n not in order]
-            order.extend(remaining)
+            emitted = bytearray(n)
+            for v in order:
+                emitted[v] = 1
+            order.extend(v for v in range(n) if not emitted[v])
         return order
 
+    def topo_sort(self) -> List[str]:
+        """
+        Topological sort returning list where dependencies come BEFORE dependents.
+        If cycles exist, return a best-effort order and log cycles.
+        """
+        name = self._name
+        return [name[v] for v in self._topo_ids()]
+
     def tier_sort(self, nodes: List[str]) -> List[str]:
         """
         Stable sort of nodes by tier priority. Keep topo order within same tier.
         """
-        def tier_val(n):
-            t = (self.meta.get(n) or {}).get("tier", "unknown") or "unknown"
-            return TIER_ORDER.get(t, TIER_ORDER["unknown"])
-        # stable sort preserving original order for equal keys
-        return sorted(nodes, key=lambda x: (tier_val(x), nodes.index(x)))
+        unknown = TIER_ORDER["unknown"]
+        meta = self.meta
+        # decorate once with (tier, position): position keeps topo order within a tier
+        # and stops the comparison before it reaches the name
+        decorated = [(TIER_ORDER.get((meta.get(n) or {}).get("tier", "unknown") or "unknown", unknown), i, n)
+                     for i, n in enumerate(nodes)]
+        decorated.sort()
+        return [n for _, _, n in decorated]
 
     def compute_upgrade_plan(self, target_roots: List[str]) -> Dict[str, Any]:
         """
@@ -384,55 +956,36 @@ class DepResolver:
            "meta": {...}
         }
         """
+        self.reload_installed_db()
         # build graph expanding groups
         self.build_graph_for(target_roots, expand_groups=True)
         cycles = self.detect_cycles()
         if cycles:
             for c in cycles:
                 shell_log("WARN", f"Dependency cycle detected: {' -> '.join(c)}")
-        topo = self.topo_sort()  # deps-before-dependents
+        name = self._name
+        topo_ids = self._topo_ids()  # deps-before-dependents
+        topo = [name[v] for v in topo_ids]
         # we want build order: from low-level to high-level (deps first)
         # topo is already deps first; we can then order by tier to ensure core before gui etc.
         ordered = self.tier_sort(topo)
 
-        # detect rebuilds: version mismatch or dependency has rebuild
-        needs_rebuild = set()
-        # helper recursive detection
-        def check_rebuild(pkg: str, visited_local: Set[str]) -> bool:
-            if pkg in self.needs_rebuild_cache:
-                return self.needs_rebuild_cache[pkg]
-            if pkg in visited_local:
-                # cycle -> force rebuild
-                self.needs_rebuild_cache[pkg] = True
-                return True
-            visited_local.add(pkg)
-            meta = self.meta.get(pkg) or get_pkg_meta(pkg)
-            installed_ver = installed_version(pkg, self.installed_db)
-            src_ver = meta.get("version", "") or ""
-            # if not installed => needs build
-            if not installed_ver:
-                self.needs_rebuild_cache[pkg] = True
-                visited_local.remove(pkg)
-                return True
-            # different version => rebuild
-            if src_ver and src_ver != installed_ver:
-                self.needs_rebuild_cache[pkg] = True
-                visited_local.remove(pkg)
-                return True
-            # if any dependency needs rebuild => this needs rebuild
-            for d in self.graph.get(pkg, []):
-                if check_rebuild(d, visited_local):
-                    self.needs_rebuild_cache[pkg] = True
-                    visited_local.remove(pkg)
-                    return True
-            self.needs_rebuild_cache[pkg] = False
-            visited_local.remove(pkg)
-            return False
-
-        for n in ordered:
-            check_rebuild(n, set())
+        # detect rebuilds: not installed, version mismatch or a dependency needs rebuild.
+        # One pass over the deps-first topo order visits each node once. Flags start
+        # at 1: a dep not decided yet can only be part of (or behind) a cycle -> force rebuild.
+        adj = self._adj
+        flags = bytearray(b"\x01") * len(name)
+        versions = self._installed_versions
+        for v in topo_ids:
+            n = name[v]
+            installed_ver = versions.get(n, "")
+            if installed_ver:
+                src_ver = (self.meta.get(n) or get_pkg_meta(n)).get("version", "") or ""
+                if (not src_ver or src_ver == installed_ver) and not any(flags[d] for d in adj[v]):
+                    flags[v] = 0
 
-        needs = [p for p, val in self.needs_rebuild_cache.items() if val]
+        needs = [name[v] for v in topo_ids if flags[v]]
+        self.needs_rebuild_cache = {name[v]: bool(flags[v]) for v in topo_ids}
 
         # populate tiers map and meta subset
         tiers = {n: (self.meta.get(n) or {}).get("tier", "unknown") for n in ordered}
@@ -454,7 +1007,6 @@ def cmd_resolve(args):
     Resolve dependencies for a package (or group). Print JSON: {"order":[...], "needs_rebuild":[...]}
     """
     dr = DepResolver()
-    dr.installed_db = read_installed_db()
     plan = dr.compute_upgrade_plan([args.pkg])
     out = {
         "pkg": args.pkg,
@@ -470,7 +1022,6 @@ def cmd_upgrade_plan(args):
     Generate upgrade plan for argument(s) or for full world if --world given.
     """
     dr = DepResolver()
-    dr.installed_db = read_installed_db()
     roots = []
     if args.world:
         # build roots from installed DB keys (package names)
@@ -499,17 +1050,44 @@ def cmd_upgrade_plan(args):
 
 def cmd_graph(args):
     dr = DepResolver()
-    dr.installed_db = read_installed_db()
     dr.build_graph_for(args.pkgs or [args.pkg], expand_groups=True)
-    # output nested graph JSON
-    def node_to_obj(n, seen):
-        if n in seen:
-            return {"pkg": n, "tier": dr.meta.get(n, {}).get("tier", "unknown"), "note": "cycle"}
-        seen.add(n)
-        deps = sorted(list(dr.graph.get(n, [])))
-        return {"pkg": n, "tier": dr.meta.get(n, {}).get("tier", "unknown"), "depends": [node_to_obj(d, seen.copy()) for d in deps]}
+    if args.dag:
+        # node-link form: linear in the graph size, whatever its shape
+        nodes = dr.topo_sort()
+        out = {
+            "nodes": [{"pkg": n, "tier": dr.meta.get(n, {}).get("tier", "unknown")} for n in nodes],
+            "edges": [[n, d] for n in nodes for d in sorted(dr.graph[n])]
+        }
+        print(json.dumps(out, indent=2, ensure_ascii=False))
+        return
+    # output nested graph JSON (a diamond repeats the shared subtree under each
+    # parent). A subtree only depends on the path above it through nodes of its
+    # own SCC, so each node is built once, bottom-up over the SCCs (deps first),
+    # and shared by all parents; only inside a cyclic SCC is the path walked,
+    # to place the "cycle" stubs.
+    name = dr._name
+    comp_of: Dict[str, int] = {}
+    sccs = dr._scc_ids()
+    for ci, comp in enumerate(sccs):
+        for v in comp:
+            comp_of[name[v]] = ci
+    memo: Dict[str, Dict[str, Any]] = {}
+
+    def node_to_obj(n, path, ci):
+        tier = dr.meta.get(n, {}).get("tier", "unknown")
+        if n in path:
+            return {"pkg": n, "tier": tier, "note": "cycle"}
+        path.add(n)
+        depends = [node_to_obj(d, path, ci) if comp_of[d] == ci else memo[d]
+                   for d in sorted(dr.graph.get(n, ()))]
+        path.discard(n)
+        return {"pkg": n, "tier": tier, "depends": depends}
+
+    for ci, comp in enumerate(sccs):
+        for v in comp:
+            memo[name[v]] = node_to_obj(name[v], set(), ci)
     roots = args.pkgs or [args.pkg]
-    out = [node_to_obj(r, set()) for r in roots]
+    out = [memo.get(r) or {"pkg": r, "tier": dr.meta.get(r, {}).get("tier", "unknown"), "depends": []} for r in roots]
     print(json.dumps(out, indent=2, ensure_ascii=False))
 
 def cmd_missing(args):
@@ -517,12 +1095,9 @@ def cmd_missing(args):
     Show missing dependencies for a package (compared to installed DB).
     """
     dr = DepResolver()
-    dr.installed_db = read_installed_db()
     dr.build_graph_for([args.pkg], expand_groups=True)
-    missing = []
-    for n in dr.graph:
-        if not is_installed(n, dr.installed_db):
-            missing.append(n)
+    installed = dr._installed_index
+    missing = [n for n in dr.graph if n not in installed]
     print(json.dumps({"pkg": args.pkg, "missing": missing}, indent=2, ensure_ascii=False))
 
 def cmd_check(args):
@@ -530,10 +1105,11 @@ def cmd_check(args):
     Check if a package is installed and up-to-date vs metafile version.
     """
     db = read_installed_db()
-    installed = is_installed(args.pkg, db)
+    index = build_installed_index(db)
+    installed = is_installed(args.pkg, db, index)
     meta = get_pkg_meta(args.pkg)
     src_ver = meta.get("version", "")
-    inst_ver = installed_version(args.pkg, db)
+    inst_ver = installed_version(args.pkg, db, index)
     needs = False
     reason = ""
     if not installed:
@@ -560,12 +1136,11 @@ def cmd_register_installed(args):
         # call porg_db.sh register if available else write directly
         dbp = INSTALLED_DB
         try:
-            # atomic append via python
-            with open(dbp, "r+", encoding="utf-8") as f:
-                data = json.load(f)
-                key = name + "-" + ver
-                data[key] = {"name": name, "version": ver, "prefix": prefix, "installed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
-                f.seek(0); f.truncate(0); json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+            # re-read the file (not the shared cached dict) and replace it atomically
+            data = read_json_file(dbp)
+            key = name + "-" + ver
+            data[key] = {"name": name, "version": ver, "prefix": prefix, "installed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            write_json_file(dbp, data, indent=True, sort_keys=True)
             out.append({"registered": key})
         except Exception as e:
             print("Failed to register:", e, file=sys.stderr)
@@ -597,6 +1172,7 @@ def build_parser():
     s_graph = sub.add_parser("graph", help="Output dependency tree (JSON)")
     s_graph.add_argument("--pkg", help="root package", dest="pkg")
     s_graph.add_argument("--pkgs", nargs="*", help="multiple roots", dest="pkgs")
+    s_graph.add_argument("--dag", action="store_true", help="nodes/edges JSON instead of a nested tree")
 
     s_missing = sub.add_parser("missing", help="List missing packages in installed DB for a given package")
     s_missing.add_argument("pkg", help="package")
@@ -614,11 +1190,16 @@ def build_parser():
     return p
 
 def cmd_info(args):
+    if not _PORTS_INDEX_READY:
+        _build_ports_index()
     info = {
         "ports_dir": PORTS_DIR,
         "installed_db": INSTALLED_DB,
         "cache": DEPS_CACHE,
-        "yaml_available": YAML_AVAILABLE
+        "ports_index": PORTS_INDEX_CACHE,
+        "metafiles_indexed": len(_PORTS_STEMS),
+        "yaml_available": bool(_yaml_backend()),
+        "yaml_loader": yaml_loader_name()
     }
     if args.json:
         print(json.dumps(info, indent=2, ensure_ascii=False))
@@ -632,6 +1213,8 @@ def cmd_info(args):
 def main():
     parser = build_parser()
     args = parser.parse_args()
+    if DEBUG_ENABLED:
+        shell_log("DEBUG", f"porg_deps.py using YAML loader: {yaml_loader_name()}")
     try:
         if args.cmd == "resolve":
             cmd_resolve(args)
@@ -22,6 +22,7 @@ LOG_JSON_DIR="${LOG_JSON_DIR:-${LOG_DIR}/json}"
 LOG_ROTATE_DAYS="${LOG_ROTATE_DAYS:-14}"
 SESSION_START_TS="$(date -u +%Y%m%dT%H%M%SZ)"
 SESSION_LOG_FILE="${LOG_DIR}/porg-${SESSION_START_TS}.log"
+export SESSION_LOG_FILE  # porg_deps.py appends its own lines here
 SESSION_JSON_FILE="${LOG_JSON_DIR}/porg-session-${SESSION_START_TS}.json"
 mkdir -p "$LOG_DIR" "$LOG_JSON_DIR"
 